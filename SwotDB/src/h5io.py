@@ -0,0 +1,175 @@
+import numpy as np
+import xarray as xr
+
+
+def _attr_str(value):
+    """Return an HDF5 string attribute as str"""
+    if isinstance(value, np.ndarray):
+        value = value.item()
+    if isinstance(value, bytes):
+        value = value.decode()
+    return str(value)
+
+
+def _attr_scalar(value):
+    """Return a (possibly length-1 array) HDF5 attribute as a NumPy scalar"""
+    return np.asarray(value).reshape(-1)[0]
+
+
+def decoded_dtype(dset):
+    """
+    dtype of an HDF5 dataset after CF decoding (see read_variable)
+
+    Follows xarray: packed data decodes to the type of scale_factor/add_offset
+    (float64 for 4-byte integers or a lone add_offset), and unpacked integers
+    with a fill value to float32 up to 2 bytes, float64 above.
+    """
+    attrs = dset.attrs
+    if 'scale_factor' in attrs or 'add_offset' in attrs:
+        scale_type = offset_type = None
+        if 'scale_factor' in attrs:
+            scale_type = np.asarray(attrs['scale_factor']).dtype
+        if 'add_offset' in attrs:
+            offset_type = np.asarray(attrs['add_offset']).dtype
+        if scale_type is not None and scale_type == offset_type and scale_type.kind == 'f':
+            if dset.dtype.kind in 'iu' and dset.dtype.itemsize == 4:
+                return np.dtype(np.float64)
+            return scale_type
+        if offset_type is not None:
+            return np.dtype(np.float64)
+        return scale_type
+    if dset.dtype.kind in 'iu' and ('_FillValue' in attrs or 'missing_value' in attrs):
+        return np.dtype(np.float32 if dset.dtype.itemsize <= 2 else np.float64)
+    return dset.dtype
+
+
+def read_variable(dset, sel=()):
+    """
+    Read an HDF5 dataset and apply CF decoding, as xarray would
+
+    Fill values (_FillValue, missing_value) become NaN and packed values are
+    unpacked with scale_factor/add_offset.
+
+    Args:
+        dset: h5py Dataset of a NetCDF4 variable
+        sel: Selection to read (anything h5py accepts, default: everything)
+    """
+    data = dset[sel]
+    attrs = dset.attrs
+    dtype = decoded_dtype(dset)
+
+    fill_values = [_attr_scalar(attrs[name])
+                   for name in ('_FillValue', 'missing_value') if name in attrs]
+    scale_factor = attrs.get('scale_factor')
+    add_offset = attrs.get('add_offset')
+
+    if not fill_values and scale_factor is None and add_offset is None:
+        return data
+
+    out = data.astype(dtype)
+    for fill_value in fill_values:
+        if dtype.kind == 'f':
+            out[data == fill_value] = np.nan
+    if scale_factor is not None:
+        out *= _attr_scalar(scale_factor)
+    if add_offset is not None:
+        out += _attr_scalar(add_offset)
+
+    return out
+
+
+def decode_times(dset, values):
+    """
+    Convert numeric values of a CF time variable to datetime64[ns]
+
+    Uses the units and calendar attributes of the HDF5 dataset the values
+    were read from (see read_variable).
+    """
+    units = _attr_str(dset.attrs['units'])
+    calendar = _attr_str(dset.attrs.get('calendar', 'standard'))
+
+    times = xr.coding.times.decode_cf_datetime(np.asarray(values), units, calendar)
+    return np.asarray(times).astype('datetime64[ns]')
+
+
+# Attributes used by HDF5/netCDF4 internally or consumed by CF decoding
+_HIDDEN_ATTRS = {
+    '_FillValue', 'missing_value', 'scale_factor', 'add_offset', 'coordinates',
+    'DIMENSION_LIST', 'REFERENCE_LIST', 'CLASS', 'NAME',
+    '_Netcdf4Dimid', '_Netcdf4Coordinates', '_NCProperties', '_nc3_strict',
+}
+
+
+def variable_attrs(obj, exclude=()):
+    """
+    User-facing attributes of an HDF5 dataset or group, as xarray shows them
+    """
+    attrs = {}
+    for name, value in obj.attrs.items():
+        if name in _HIDDEN_ATTRS or name in exclude:
+            continue
+        if isinstance(value, bytes):
+            value = value.decode()
+        elif isinstance(value, np.ndarray) and value.size == 1:
+            value = value.reshape(-1)[0]
+        attrs[name] = value
+    return attrs
+
+
+def variable_encoding(dset, times=False, shape=None):
+    """
+    On-disk encoding of an HDF5 dataset, as xarray keeps it in .encoding
+
+    Lets to_netcdf() write the variable back packed, compressed and chunked
+    like the source, with its fill value (and, for times decoded with
+    decode_times, its units and calendar). Chunks are clamped to shape, the
+    shape of the variable the encoding is for, if it differs from dset's.
+    """
+    encoding = {'dtype': dset.dtype}
+    for name in ('_FillValue', 'missing_value', 'scale_factor', 'add_offset'):
+        if name in dset.attrs:
+            encoding[name] = _attr_scalar(dset.attrs[name])
+    if times:
+        for name in ('units', 'calendar'):
+            if name in dset.attrs:
+                encoding[name] = _attr_str(dset.attrs[name])
+
+    encoding['zlib'] = dset.compression == 'gzip'
+    if dset.compression == 'gzip':
+        encoding['complevel'] = dset.compression_opts
+    elif dset.compression is not None:
+        encoding['compression'] = dset.compression
+        encoding['compression_opts'] = dset.compression_opts
+    encoding['shuffle'] = dset.shuffle
+    encoding['fletcher32'] = dset.fletcher32
+
+    encoding['contiguous'] = dset.chunks is None
+    encoding['chunksizes'] = None
+    if dset.chunks is not None:
+        shape = dset.shape if shape is None else shape
+        encoding['chunksizes'] = tuple(min(chunk, max(size, 1))
+                                       for chunk, size in zip(dset.chunks, shape))
+    return encoding
+
+
+def coordinate_names(group):
+    """
+    Names of the variables of an HDF5 group that xarray decodes as
+    coordinates, i.e. those listed in a CF coordinates attribute
+    """
+    names = set()
+    for obj in [group] + [obj for obj in group.values() if hasattr(obj, 'dtype')]:
+        if 'coordinates' in obj.attrs:
+            names.update(_attr_str(obj.attrs['coordinates']).split())
+    return {name for name in names if name in group}
+
+
+def dimension_names(dset):
+    """Names of the netCDF dimensions of an HDF5 dataset"""
+    names = []
+    for axis, scales in enumerate(dset.dims):
+        if len(scales):
+            names.append(scales[0].name.rsplit('/', 1)[-1])
+        else:
+            names.append(f"dim_{axis}")
+    return tuple(names)
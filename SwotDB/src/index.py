@@ -1,12 +1,162 @@
-import xarray as xr
+import h5py
 import numpy as np
-import pandas as pd
 from pathlib import Path
 from shapely.geometry import box
 import geopandas as gpd
-from rtree import index as rtree_index
+import json
 import pickle
 import shutil
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from numba import njit
+
+from SwotDB.src.h5io import read_variable, decode_times
+
+@njit(cache=True, nogil=True)
+def _tile_bboxes(lat, lon, tile_size, out_lat_min, out_lat_max,
+                 out_lon_min, out_lon_max):
+    """
+    Compute the bounding box of each block of tile_size lines of a swath
+
+    Longitudes are normalized to -180/180 and NaN coordinates are ignored.
+    Tiles without any valid coordinate get min = +inf and max = -inf.
+
+    Single-threaded: files are processed in parallel by worker processes, and
+    Numba's threading layer does not survive being forked once initialized.
+    """
+    num_lines = lat.shape[0]
+    for t in range(out_lat_min.shape[0]):
+        lat_lo, lat_hi = np.inf, -np.inf
+        lon_lo, lon_hi = np.inf, -np.inf
+        for i in range(t * tile_size, min((t + 1) * tile_size, num_lines)):
+            for j in range(lat.shape[1]):
+                la = lat[i, j]
+                if la < lat_lo:
+                    lat_lo = la
+                if la > lat_hi:
+                    lat_hi = la
+                lo = ((lon[i, j] + 180.0) % 360.0) - 180.0
+                if lo < lon_lo:
+                    lon_lo = lo
+                if lo > lon_hi:
+                    lon_hi = lo
+        out_lat_min[t] = lat_lo
+        out_lat_max[t] = lat_hi
+        out_lon_min[t] = lon_lo
+        out_lon_max[t] = lon_hi
+
+
+def _bbox_to_float32(bbox):
+    """
+    Convert (lon_min, lat_min, lon_max, lat_max) boxes to float32, rounding
+    outward so that the stored box always contains the original one
+    """
+    bbox = np.asarray(bbox, dtype=np.float64).reshape(-1, 4)
+    out = bbox.astype(np.float32)
+    
+    mins, maxs = out[:, :2], out[:, 2:]
+    too_high = mins > bbox[:, :2]
+    mins[too_high] = np.nextafter(mins[too_high], np.float32(-np.inf))
+    too_low = maxs < bbox[:, 2:]
+    maxs[too_low] = np.nextafter(maxs[too_low], np.float32(np.inf))
+    
+    return out
+
+
+# Quantized bboxes are int16 fixed-point with this many steps per degree,
+# 0.01° (~1 km) is far finer than a tile and keeps ±180° within int16 range
+_BBOX_SCALE = 100
+
+
+def _quantize(degrees, rounding):
+    """
+    Convert degrees to int16 fixed-point, rounding with np.floor or np.ceil
+    """
+    scaled = rounding(np.asarray(degrees, dtype=np.float64) * _BBOX_SCALE)
+    return np.clip(scaled, np.iinfo(np.int16).min, np.iinfo(np.int16).max).astype(np.int16)
+
+
+def _quantize_bbox(bbox):
+    """
+    Quantize (lon_min, lat_min, lon_max, lat_max) boxes, rounding outward
+    so that the quantized box always contains the original one
+    """
+    bbox = np.asarray(bbox).reshape(-1, 4)
+    return np.hstack([_quantize(bbox[:, :2], np.floor), _quantize(bbox[:, 2:], np.ceil)])
+
+
+def _to_ns(times):
+    """
+    Convert times to int64 nanoseconds since the epoch
+
+    Accepts anything np.datetime64 understands (datetime64, datetime,
+    pd.Timestamp, ISO strings), as a scalar or a sequence.
+    """
+    if np.ndim(times) == 0:
+        return np.datetime64(times, 'ns').astype(np.int64)
+    return np.asarray(times, dtype='datetime64[ns]').view(np.int64)
+
+
+def _extract_tiles(filepath, tile_size):
+    """
+    Split a SWOT file into tiles of tile_size lines
+    Returns dict of per-tile arrays: 'bbox' (lon_min, lat_min, lon_max,
+    lat_max), 'line_start', 'line_end', 't_min', 't_max'
+
+    Module-level so that it can run in worker processes.
+    """
+    # Read coordinates once with h5py and tile them as plain NumPy arrays
+    with h5py.File(filepath, 'r') as f:
+        lat = read_variable(f['latitude'])
+        lon = read_variable(f['longitude'])
+        
+        # Get time bounds
+        time = read_variable(f['time'])
+        time_min, time_max = decode_times(f['time'], [np.nanmin(time), np.nanmax(time)])
+    
+    # Bounding box of every tile along the swath in a single sweep
+    num_lines = lat.shape[0]
+    num_tiles = -(-num_lines // tile_size)
+    tile_lat_min = np.empty(num_tiles)
+    tile_lat_max = np.empty(num_tiles)
+    tile_lon_min = np.empty(num_tiles)
+    tile_lon_max = np.empty(num_tiles)
+    _tile_bboxes(np.ascontiguousarray(lat, dtype=np.float64),
+                 np.ascontiguousarray(lon, dtype=np.float64), tile_size,
+                 tile_lat_min, tile_lat_max, tile_lon_min, tile_lon_max)
+    
+    # Skip tiles without any valid coordinates
+    valid = (tile_lat_min <= tile_lat_max) & (tile_lon_min <= tile_lon_max)
+    
+    # Handle antimeridian crossing (±180°).
+    # After normalization, a crossing tile has lon_min ≈ -180 and
+    # lon_max ≈ +180 so their difference is ~360 > 180.
+    # Split at the prime meridian (0°) into a western and eastern entry.
+    crossing = valid & (tile_lon_max - tile_lon_min > 180)
+    
+    # Row of each index entry: valid tiles once, crossing tiles twice
+    tiles = np.repeat(np.arange(num_tiles), valid.astype(np.intp) + crossing)
+    bbox = np.column_stack([tile_lon_min, tile_lat_min, tile_lon_max, tile_lat_max])[tiles]
+    split = crossing[tiles]
+    western = np.ones(len(tiles), dtype=bool)
+    western[1:] = tiles[1:] != tiles[:-1]
+    bbox[split & western, 2] = 0.0
+    bbox[split & ~western, 0] = 0.0
+    
+    return {
+        'bbox': bbox,
+        'line_start': tiles * tile_size,
+        'line_end': np.minimum((tiles + 1) * tile_size, num_lines),
+        't_min': np.full(len(tiles), time_min),
+        't_max': np.full(len(tiles), time_max),
+    }
+
+
+# query_tiles() only prefilters by lat_max when that leaves at most this share
+# of the tiles, otherwise it scans all of them
+_PREFILTER_MAX_SHARE = 0.1
+
 
 class SWOTSpatialIndex:
     """Spatial index for SWOT swath data with auto-save capability"""
@@ -14,12 +164,29 @@ class SWOTSpatialIndex:
     def __init__(self, index_file='swot_index', tile_size=493, autosave_interval=100):
         # Remove .pkl extension if provided
         self.index_file = index_file.replace('.pkl', '')
-        self.metadata_file = f"{self.index_file}_metadata.pkl"
+        self.metadata_file = f"{self.index_file}_metadata.json"
+        self.tiles_dir = f"{self.index_file}_tiles"
+        
+        # Tile metadata as parallel (structure-of-arrays) columns, where the
+        # tile id is the row number. Bboxes are (lon_min, lat_min, lon_max, lat_max)
+        # and time bounds are datetime64[ns] stored as int64 nanoseconds.
+        # Queries scan the quantized bbox_q copy, bbox is kept for reporting.
+        self._bbox = np.empty((0, 4), dtype=np.float32)
+        self._bbox_q = np.empty((0, 4), dtype=np.int16)
+        self._line_start = np.empty(0, dtype=np.int32)
+        self._line_end = np.empty(0, dtype=np.int32)
+        self._t_min = np.empty(0, dtype=np.int64)
+        self._t_max = np.empty(0, dtype=np.int64)
+        self._file_idx = np.empty(0, dtype=np.int32)
+        self._files = []  # Deduplicated file paths referenced by _file_idx
+        self._file_ids = {}  # File path -> position in _files
+        self._pending = []  # Tile blocks added since the columns were last built
+        
+        # Tile ids sorted by lat_max and the sorted lat_max values, used to
+        # prefilter queries by binary search (built lazily)
+        self._lat_max_order = None
+        self._lat_max_sorted = None
         
-        # Create new in-memory index
-        self.spatial_idx = rtree_index.Index()
-        self.metadata = {}
-        self.file_counter = 0
         self.indexed_files = set()  # Track which files have been indexed
         self.tile_size = tile_size  # Store as instance attribute
         self.base_path = None  # Original base path (set when first file added)
@@ -35,10 +202,6 @@ class SWOTSpatialIndex:
         """
         filepath_str = str(filepath)
         
-        # Set base_path from first file if not set
-        if self.base_path is None:
-            self.base_path = str(Path(filepath).parent)
-        
         # Skip if already indexed
         if filepath_str in self.indexed_files:
             print(f"  Skipping {Path(filepath).name} (already indexed)")
@@ -48,106 +211,159 @@ class SWOTSpatialIndex:
         if tile_size is None:
             tile_size = self.tile_size
         
-        ds = xr.open_dataset(filepath)
-        
-        # Get time bounds
-        time_min = pd.Timestamp(ds.time.min().values)
-        time_max = pd.Timestamp(ds.time.max().values)
+        tiles = _extract_tiles(filepath_str, tile_size)
+        self._ingest(filepath_str, tiles)
+    
+    def _ingest(self, filepath, tiles):
+        """
+        Add the tiles of one file, as returned by _extract_tiles(), to the index
+        """
+        # Set base_path from first file if not set
+        if self.base_path is None:
+            self.base_path = str(Path(filepath).parent)
         
-        num_lines = ds.sizes['num_lines']
-        num_pixels = ds.sizes['num_pixels']
-        
-        # Create tiles along the swath
-        for tile_start in range(0, num_lines, tile_size):
-            tile_end = min(tile_start + tile_size, num_lines)
-            
-            # Get bounding box for this tile
-            lat_tile = ds.latitude.isel(num_lines=slice(tile_start, tile_end))
-            lon_tile = ds.longitude.isel(num_lines=slice(tile_start, tile_end))
-
-            lat_min, lat_max = float(lat_tile.min()), float(lat_tile.max())
-            # Normalize longitudes to -180/180 for consistent R-tree storage
-            lon_tile_norm = ((lon_tile + 180) % 360) - 180
-            lon_min, lon_max = float(lon_tile_norm.min()), float(lon_tile_norm.max())
-            
-            # Handle antimeridian crossing (±180°).
-            # After normalization, a crossing tile has lon_min ≈ -180 and
-            # lon_max ≈ +180 so their difference is ~360 > 180.
-            # Split at the prime meridian (0°) into a western and eastern entry.
-            if lon_max - lon_min > 180:
-                self._add_tile(filepath_str, tile_start, tile_end,
-                              lat_min, lat_max, lon_min, 0.0,
-                              time_min, time_max)
-                self._add_tile(filepath_str, tile_start, tile_end,
-                              lat_min, lat_max, 0.0, lon_max,
-                              time_min, time_max)
-            else:
-                self._add_tile(filepath_str, tile_start, tile_end,
-                              lat_min, lat_max, lon_min, lon_max,
-                              time_min, time_max)
+        self._append_tiles(self._file_id(filepath), **tiles)
         
         # Mark file as indexed
-        self.indexed_files.add(filepath_str)
-        
-        ds.close()
+        self.indexed_files.add(filepath)
         
         # Auto-save check
         self.files_since_save += 1
         if self.autosave_interval > 0 and self.files_since_save >= self.autosave_interval:
             self._autosave()
+    
+    def _file_id(self, filepath):
+        """Position of filepath in the file table, adding it if needed"""
+        file_id = self._file_ids.get(filepath)
+        if file_id is None:
+            file_id = len(self._files)
+            self._files.append(filepath)
+            self._file_ids[filepath] = file_id
+        return file_id
+    
+    def _append_tiles(self, file_idx, bbox, line_start, line_end, t_min, t_max):
+        """
+        Add a block of tiles to the spatial index
         
-    def _add_tile(self, filepath, line_start, line_end,
-                  lat_min, lat_max, lon_min, lon_max,
-                  time_min, time_max):
-        """Add a single tile to the spatial index"""
+        Arguments are per-tile arrays (file_idx may also be a single file id);
+        the block is buffered until the columns are next needed.
+        """
+        line_start = np.asarray(line_start, dtype=np.int32)
+        bbox = _bbox_to_float32(bbox)
         
-        tile_id = self.file_counter
-        self.file_counter += 1
+        self._pending.append({
+            'bbox': bbox,
+            'bbox_q': _quantize_bbox(bbox),
+            'line_start': line_start,
+            'line_end': np.asarray(line_end, dtype=np.int32),
+            't_min': _to_ns(t_min),
+            't_max': _to_ns(t_max),
+            'file_idx': np.broadcast_to(np.asarray(file_idx, dtype=np.int32),
+                                        line_start.shape),
+        })
+    
+    def _flush_pending(self):
+        """Append buffered tile blocks to the metadata columns"""
+        if not self._pending:
+            return
         
-        # R-tree expects (minx, miny, maxx, maxy)
-        bbox = (lon_min, lat_min, lon_max, lat_max)
+        for name, column in self._columns().items():
+            setattr(self, f"_{name}", np.concatenate(
+                [column] + [block[name] for block in self._pending]))
         
-        # Insert into spatial index
-        self.spatial_idx.insert(tile_id, bbox)
+        self._pending = []
+        self._lat_max_order = None
+        self._lat_max_sorted = None
+    
+    def _lat_max_index(self):
+        """
+        Tile ids sorted by lat_max, and the sorted lat_max values
+        """
+        self._flush_pending()
         
-        # Store metadata
-        self.metadata[tile_id] = {
-            'file': str(filepath),
-            'line_range': (line_start, line_end),
-            'bbox': bbox,
-            'time_range': (time_min, time_max)
-        }
+        if self._lat_max_order is None:
+            self._lat_max_order = np.argsort(self._bbox[:, 3], kind='stable')
+            self._lat_max_sorted = self._bbox[self._lat_max_order, 3]
+        
+        return self._lat_max_order, self._lat_max_sorted
+    
+    @property
+    def num_tiles(self):
+        """Total number of tiles in the index"""
+        return len(self._line_start) + sum(len(block['line_start'])
+                                           for block in self._pending)
     
     def _autosave(self):
         """Internal auto-save without resetting counter"""
-        temp_file = f"{self.metadata_file}.tmp"
-        
         try:
-            # Save to temporary file first
-            with open(temp_file, 'wb') as f:
-                pickle.dump({
-                    'metadata': self.metadata,
-                    'file_counter': self.file_counter,
-                    'indexed_files': self.indexed_files,
-                    'tile_size': self.tile_size,
-                    'base_path': self.base_path
-                }, f)
+            self._write()
             
-            # Move temporary file to actual file (atomic operation)
-            shutil.move(temp_file, self.metadata_file)
-            
-            print(f"  [Auto-saved: {len(self.indexed_files)} files, {len(self.metadata)} tiles]")
+            print(f"  [Auto-saved: {len(self.indexed_files)} files, {self.num_tiles} tiles]")
             self.files_since_save = 0
             
         except Exception as e:
             print(f"  [Auto-save failed: {e}]")
+    
+    def _write(self):
+        """
+        Write the metadata columns and the JSON header to disk
+
+        Every file is written to a temporary path first and then moved into
+        place (atomic operation). Columns only ever grow, so the header is
+        written last and records the tile count that is valid to read back.
+        The lat_max sort order is saved too, so loading does not re-sort.
+        """
+        order, lat_max_sorted = self._lat_max_index()
+        
+        Path(self.tiles_dir).mkdir(parents=True, exist_ok=True)
+        arrays = dict(self._columns(), lat_max_order=order,
+                      lat_max_sorted=lat_max_sorted)
+        for name, array in arrays.items():
+            array_file = Path(self.tiles_dir) / f"{name}.npy"
+            temp_file = f"{array_file}.tmp"
+            try:
+                with open(temp_file, 'wb') as f:
+                    np.save(f, array)
+                os.replace(temp_file, array_file)
+            finally:
+                if Path(temp_file).exists():
+                    Path(temp_file).unlink()
+        
+        temp_file = f"{self.metadata_file}.tmp"
+        try:
+            with open(temp_file, 'w') as f:
+                json.dump({
+                    'num_tiles': self.num_tiles,
+                    'files': self._files,
+                    'indexed_files': sorted(self.indexed_files),
+                    'tile_size': self.tile_size,
+                    'base_path': self.base_path
+                }, f)
+            shutil.move(temp_file, self.metadata_file)
+        finally:
             if Path(temp_file).exists():
                 Path(temp_file).unlink()
     
-    def add_files_from_directory(self, directory, pattern='*.nc', tile_size=None):
+    def _columns(self):
+        """Metadata columns keyed by their on-disk name"""
+        return {
+            'bbox': self._bbox,
+            'bbox_q': self._bbox_q,
+            'line_start': self._line_start,
+            'line_end': self._line_end,
+            't_min': self._t_min,
+            't_max': self._t_max,
+            'file_idx': self._file_idx,
+        }
+    
+    def add_files_from_directory(self, directory, pattern='*.nc', tile_size=None,
+                                 max_workers=None):
         """
         Add all matching files from a directory
         Skips files that are already indexed
+        
+        Files are read in parallel by max_workers processes (default: number
+        of CPUs); tiles are added and auto-saved in the main process.
         """
         files = list(Path(directory).glob(pattern))
         new_files = [f for f in files if str(f) not in self.indexed_files]
@@ -156,9 +372,17 @@ class SWOTSpatialIndex:
         if self.autosave_interval > 0:
             print(f"Auto-save enabled: every {self.autosave_interval} files")
         
-        for i, filepath in enumerate(new_files, 1):
-            print(f"[{i}/{len(new_files)}] Indexing {filepath.name}")
-            self.add_file(filepath, tile_size=tile_size)
+        # Use instance tile_size if not specified
+        if tile_size is None:
+            tile_size = self.tile_size
+        
+        if new_files:
+            with ProcessPoolExecutor(max_workers=max_workers or os.cpu_count()) as executor:
+                results = executor.map(_extract_tiles, [str(f) for f in new_files],
+                                       repeat(tile_size), chunksize=4)
+                for i, (filepath, tiles) in enumerate(zip(new_files, results), 1):
+                    print(f"[{i}/{len(new_files)}] Indexing {filepath.name}")
+                    self._ingest(str(filepath), tiles)
         
         print(f"Added {len(new_files)} files to index")
         
@@ -176,42 +400,95 @@ class SWOTSpatialIndex:
         Longitude inputs may be in either 0-360 or -180/180 convention.
         Wrap-around queries (e.g. lon_min=350, lon_max=10) are supported.
         """
+        tile_ids = self.query_tiles(lat_min, lat_max, lon_min, lon_max,
+                                    time_start, time_end)
+        
+        return [
+            {
+                'file': self._files[self._file_idx[tile_id]],
+                'line_range': (int(self._line_start[tile_id]),
+                               int(self._line_end[tile_id])),
+                'bbox': tuple(float(v) for v in self._bbox[tile_id])
+            }
+            for tile_id in tile_ids
+        ]
+    
+    def query_tiles(self, lat_min, lat_max, lon_min, lon_max,
+                    time_start=None, time_end=None):
+        """
+        Query the index for tiles within bounds
+        Returns sorted array of tile ids, see get_tiles() for their metadata
+
+        Same conventions as query(), without building per-tile dicts.
+        """
         # Normalize query bounds to -180/180 to match stored tile bboxes
         lon_min = ((lon_min + 180) % 360) - 180
         lon_max = ((lon_max + 180) % 360) - 180
 
-        # Get candidate tiles from spatial index.
-        # If the query wraps around the dateline (lon_min > lon_max after
-        # normalization), split into two R-tree queries.
+        # The tests run on the quantized bboxes; rounding the query bounds in
+        # the same direction as the tile edges they are compared with never
+        # drops a matching tile.
+        lat_min_q = _quantize(lat_min, np.ceil)
+        lat_max_q = _quantize(lat_max, np.floor)
+        lon_min_q = _quantize(lon_min, np.ceil)
+        lon_max_q = _quantize(lon_max, np.floor)
+        
+        # Only tiles reaching north of lat_min can match. Binary search on the
+        # sorted lat_max finds them, but in lat_max order, so testing them
+        # gathers the columns at random positions. That only beats a scan in
+        # storage order when few tiles are left, i.e. for boxes near the pole.
+        order, lat_max_sorted = self._lat_max_index()
+        first = np.searchsorted(lat_max_sorted, lat_min, side='left')
+        if len(order) - first <= _PREFILTER_MAX_SHARE * len(order):
+            candidate_ids = np.sort(order[first:])
+            bbox = self._bbox_q[candidate_ids]
+            t_min = self._t_min[candidate_ids]
+            t_max = self._t_max[candidate_ids]
+            keep = bbox[:, 1] <= lat_max_q
+        else:
+            candidate_ids = None
+            bbox, t_min, t_max = self._bbox_q, self._t_min, self._t_max
+            keep = (bbox[:, 1] <= lat_max_q) & (bbox[:, 3] >= lat_min_q)
+        
+        # Test the candidate bboxes against the query box. If the query wraps
+        # around the dateline (lon_min > lon_max after normalization), a tile
+        # matches if it reaches east of lon_min OR west of lon_max.
         if lon_min > lon_max:
-            candidate_ids = list(
-                set(self.spatial_idx.intersection((lon_min, lat_min, 180.0, lat_max))) |
-                set(self.spatial_idx.intersection((-180.0, lat_min, lon_max, lat_max)))
-            )
+            keep &= (bbox[:, 2] >= lon_min_q) | (bbox[:, 0] <= lon_max_q)
         else:
-            candidate_ids = list(self.spatial_idx.intersection((lon_min, lat_min, lon_max, lat_max)))
+            keep &= (bbox[:, 0] <= lon_max_q) & (bbox[:, 2] >= lon_min_q)
         
         # Filter by time if provided
-        results = []
-        for tile_id in candidate_ids:
-            if tile_id not in self.metadata:
-                continue
-                
-            meta = self.metadata[tile_id]
-            
-            # Time filter
-            if time_start and meta['time_range'][1] < time_start:
-                continue
-            if time_end and meta['time_range'][0] > time_end:
-                continue
-            
-            results.append({
-                'file': meta['file'],
-                'line_range': meta['line_range'],
-                'bbox': meta['bbox']
-            })
+        if time_start is not None:
+            keep &= t_max >= _to_ns(time_start)
+        if time_end is not None:
+            keep &= t_min <= _to_ns(time_end)
+        
+        if candidate_ids is None:
+            return np.flatnonzero(keep)
+        return candidate_ids[keep]
+    
+    def get_tiles(self, tile_ids):
+        """
+        Look up metadata for the given tile ids
+        Returns dict of arrays: 'file_idx', 'line_start', 'line_end', 'bbox'
+
+        'file_idx' indexes into the files attribute; bboxes are
+        (lon_min, lat_min, lon_max, lat_max).
+        """
+        self._flush_pending()
         
-        return results
+        return {
+            'file_idx': self._file_idx[tile_ids],
+            'line_start': self._line_start[tile_ids],
+            'line_end': self._line_end[tile_ids],
+            'bbox': self._bbox[tile_ids]
+        }
+    
+    @property
+    def files(self):
+        """File paths referenced by the tiles' file_idx"""
+        return self._files
     
     def set_base_path(self, new_base_path):
         """
@@ -233,19 +510,20 @@ class SWOTSpatialIndex:
         print(f"  Old base: {old_base}")
         print(f"  New base: {new_base}")
         
-        # Update metadata with new paths
+        # Update file table with new paths
         updated_count = 0
-        for tile_id, meta in self.metadata.items():
-            old_path = Path(meta['file'])
+        for file_id, old_path in enumerate(self._files):
+            old_path = Path(old_path)
             # Get relative path from old base
             try:
                 rel_path = old_path.relative_to(old_base)
                 new_path = new_base / rel_path
-                meta['file'] = str(new_path)
+                self._files[file_id] = str(new_path)
                 updated_count += 1
             except ValueError:
                 # Path is not relative to old_base, skip
                 print(f"Warning: Could not remap {old_path}")
+        self._file_ids = {f: i for i, f in enumerate(self._files)}
         
         # Update indexed_files set
         new_indexed_files = set()
@@ -260,22 +538,14 @@ class SWOTSpatialIndex:
         self.indexed_files = new_indexed_files
         self.base_path = str(new_base)
         
-        print(f"Remapped {updated_count} tile paths")
+        print(f"Remapped {updated_count} file paths")
     
     def save(self):
         """Save index to disk"""
-        # Save all data to pickle (including R-tree bboxes for reconstruction)
-        with open(self.metadata_file, 'wb') as f:
-            pickle.dump({
-                'metadata': self.metadata,
-                'file_counter': self.file_counter,
-                'indexed_files': self.indexed_files,
-                'tile_size': self.tile_size,
-                'base_path': self.base_path
-            }, f)
-        
-        print(f"Index saved to {self.metadata_file}")
-        print(f"  - {len(self.metadata)} tiles")
+        self._write()
+        
+        print(f"Index saved to {self.metadata_file} and {self.tiles_dir}")
+        print(f"  - {self.num_tiles} tiles")
         print(f"  - {len(self.indexed_files)} files indexed")
         print(f"  - Tile size: {self.tile_size} lines")
         print(f"  - Base path: {self.base_path}")
@@ -283,10 +553,17 @@ class SWOTSpatialIndex:
         # Reset auto-save counter
         self.files_since_save = 0
     
+    @staticmethod
+    def exists(index_file='swot_index'):
+        """Check whether an index has been saved under index_file"""
+        index_file = index_file.replace('.pkl', '')
+        return (Path(f"{index_file}_metadata.json").exists() or
+                Path(f"{index_file}_metadata.pkl").exists())
+    
     @classmethod
     def load(cls, index_file='swot_index', new_base_path=None, autosave_interval=10):
         """
-        Load index from disk and rebuild R-tree
+        Load index from disk
         
         Args:
             index_file: Path to index file
@@ -294,30 +571,61 @@ class SWOTSpatialIndex:
             autosave_interval: Auto-save interval for future operations (default: 10)
         """
         index_file = index_file.replace('.pkl', '')
-        metadata_file = f"{index_file}_metadata.pkl"
-        
-        if not Path(metadata_file).exists():
+        metadata_file = f"{index_file}_metadata.json"
+        legacy_file = f"{index_file}_metadata.pkl"
+        
+        if Path(metadata_file).exists():
+            with open(metadata_file) as f:
+                data = json.load(f)
+        elif Path(legacy_file).exists():
+            # Indices saved before the JSON header was introduced
+            with open(legacy_file, 'rb') as f:
+                data = pickle.load(f)
+        else:
             raise FileNotFoundError(f"Index file not found: {metadata_file}")
         
-        with open(metadata_file, 'rb') as f:
-            data = pickle.load(f)
-        
         # Get tile_size from saved data (default to 493 for old indices)
         tile_size = data.get('tile_size', 493)
         
         # Create new instance
         idx = cls(index_file, tile_size=tile_size, autosave_interval=autosave_interval)
-        idx.metadata = data['metadata']
-        idx.file_counter = data['file_counter']
-        idx.indexed_files = data.get('indexed_files', set())
+        idx.indexed_files = set(data.get('indexed_files', []))
         idx.base_path = data.get('base_path', None)
         
-        # Rebuild R-tree from metadata
-        print(f"Rebuilding spatial index from {len(idx.metadata)} tiles...")
-        for tile_id, meta in idx.metadata.items():
-            idx.spatial_idx.insert(tile_id, meta['bbox'])
-        
-        print(f"Index loaded: {len(idx.metadata)} tiles from {len(idx.indexed_files)} files")
+        if 'metadata' in data:
+            # Older indices pickled a dict of per-tile metadata
+            print(f"Converting {len(data['metadata'])} tiles from legacy index format...")
+            metas = [data['metadata'][tile_id] for tile_id in sorted(data['metadata'])]
+            idx._append_tiles(
+                [idx._file_id(meta['file']) for meta in metas],
+                [meta['bbox'] for meta in metas],
+                [meta['line_range'][0] for meta in metas],
+                [meta['line_range'][1] for meta in metas],
+                [meta['time_range'][0] for meta in metas],
+                [meta['time_range'][1] for meta in metas],
+            )
+            idx._flush_pending()
+        else:
+            # Memory-map the columns so loading does not depend on index size
+            num_tiles = data['num_tiles']
+            for name in idx._columns():
+                column = np.load(Path(idx.tiles_dir) / f"{name}.npy", mmap_mode='r')
+                setattr(idx, f"_{name}", column[:num_tiles])
+            idx._files = data['files']
+            idx._file_ids = {f: i for i, f in enumerate(idx._files)}
+            
+            # The saved lat_max sort order is only valid if it covers exactly
+            # these tiles; otherwise it is rebuilt on first query
+            order_file = Path(idx.tiles_dir) / "lat_max_order.npy"
+            sorted_file = Path(idx.tiles_dir) / "lat_max_sorted.npy"
+            if order_file.exists() and sorted_file.exists():
+                order = np.load(order_file, mmap_mode='r')
+                lat_max_sorted = np.load(sorted_file, mmap_mode='r')
+                if len(order) == num_tiles and len(lat_max_sorted) == num_tiles:
+                    idx._lat_max_order = order
+                    idx._lat_max_sorted = lat_max_sorted
+        
+        print(f"Index loaded: {idx.num_tiles} tiles from {len(idx.indexed_files)} files")
         print(f"  - Tile size: {idx.tile_size} lines")
         print(f"  - Auto-save interval: {idx.autosave_interval} files")
         if idx.base_path:
@@ -332,7 +640,7 @@ class SWOTSpatialIndex:
     def get_stats(self):
         """Get index statistics"""
         return {
-            'num_tiles': len(self.metadata),
+            'num_tiles': self.num_tiles,
             'num_files': len(self.indexed_files),
             'tile_size': self.tile_size,
             'base_path': self.base_path,
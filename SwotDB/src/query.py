@@ -1,12 +1,17 @@
 from SwotDB.src.index import SWOTSpatialIndex
 import xarray as xr
 import numpy as np
-import pandas as pd
+import os
 from pathlib import Path
-from collections import defaultdict
+from collections import defaultdict, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import h5py
+from numba import njit
 
-import xarray as xr
-import numpy as np
+from SwotDB.src.h5io import (read_variable, decode_times, decoded_dtype,
+                             variable_attrs, variable_encoding, coordinate_names,
+                             dimension_names)
 
 def mask_nadir_observations(ds, variables_to_mask):
     """
@@ -48,6 +53,54 @@ def mask_nadir_observations(ds, variables_to_mask):
     return ds_masked
 
 
+@njit(cache=True, nogil=True)
+def _bbox_line_mask(lat, lon, lat_min, lat_max, lon_min, lon_max, out):
+    """
+    Flag lines where ANY pixel falls inside the query box
+
+    Fuses the bounds comparisons and the per-line any-reduction into a single
+    pass, stopping at the first matching pixel of each line. Longitudes are
+    normalized to -180/180 on the fly; lon_min/lon_max must already be
+    normalized, and lon_min > lon_max denotes a query wrapping the dateline.
+
+    Runs without the GIL but single-threaded: it is called concurrently from
+    the per-file thread pool, and launching Numba parallel regions from
+    several Python threads at once is not supported by all threading layers.
+    """
+    wraps = lon_min > lon_max
+    for i in range(lat.shape[0]):
+        hit = False
+        for j in range(lat.shape[1]):
+            la = lat[i, j]
+            if la >= lat_min and la <= lat_max:
+                lo = ((lon[i, j] + 180.0) % 360.0) - 180.0
+                if wraps:
+                    in_lon = lo >= lon_min or lo <= lon_max
+                else:
+                    in_lon = lo >= lon_min and lo <= lon_max
+                if in_lon:
+                    hit = True
+                    break
+        out[i] = hit
+
+
+@njit(cache=True, nogil=True)
+def _valid_line_mask(lat, lon, out):
+    """
+    Flag lines with ANY pixel that has both a valid latitude and longitude
+
+    Used for tiles lying entirely inside the query box, where every such
+    pixel is known to be in the box; lines of fill values still are not.
+    """
+    for i in range(lat.shape[0]):
+        hit = False
+        for j in range(lat.shape[1]):
+            if np.isfinite(lat[i, j]) and np.isfinite(lon[i, j]):
+                hit = True
+                break
+        out[i] = hit
+
+
 def merge_line_ranges(line_ranges):
     """
     Merge overlapping/adjacent line ranges into contiguous slices
@@ -55,32 +108,237 @@ def merge_line_ranges(line_ranges):
     Input: [(0, 500), (500, 1000), (2000, 2500)]
     Output: [slice(0, 1000), slice(2000, 2500)]
     """
-    if not line_ranges:
+    if len(line_ranges) == 0:
         return []
     
     # Sort by start line
-    sorted_ranges = sorted(line_ranges)
+    ranges = np.asarray(line_ranges, dtype=np.int64).reshape(-1, 2)
+    ranges = ranges[np.argsort(ranges[:, 0], kind='stable')]
+    
+    # A range starts a new slice if there is a gap after all previous ranges
+    ends_so_far = np.maximum.accumulate(ranges[:, 1])
+    new_slice = np.empty(len(ranges), dtype=bool)
+    new_slice[0] = True
+    new_slice[1:] = ranges[1:, 0] > ends_so_far[:-1]
+    
+    first = np.flatnonzero(new_slice)
+    starts = ranges[first, 0]
+    ends = np.maximum.reduceat(ranges[:, 1], first)
+    
+    return [slice(start, end) for start, end in zip(starts.tolist(), ends.tolist())]
+
+
+def _prefetch_files(filepaths):
+    """
+    Hint the kernel to read files into the page cache in the background
+
+    Issues posix_fadvise(POSIX_FADV_WILLNEED) for each file so that reads for
+    all files are queued at once rather than one file at a time. No-op on
+    platforms without posix_fadvise.
+    """
+    if not hasattr(os, 'posix_fadvise'):
+        return
+    
+    for filepath in filepaths:
+        try:
+            fd = os.open(filepath, os.O_RDONLY)
+            try:
+                os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+            finally:
+                os.close(fd)
+        except OSError:
+            # Prefetching is only a hint, the actual read will report errors
+            pass
+
+
+# Open file handles shared across queries: path -> (mtime, h5py.File), least
+# recently used first
+_open_files = OrderedDict()
+_open_files_lock = threading.Lock()
+_MAX_OPEN_FILES = 64
+
+
+def _open_file(filepath):
+    """
+    Open a netCDF file for reading, reusing the handle across queries
+
+    Handles must not be closed by the caller. If the file was modified or
+    replaced on disk, it is opened again. Handles dropped from the cache,
+    because of that, eviction beyond _MAX_OPEN_FILES or
+    query_swot_data.cache_clear(), are not closed here as a query may still
+    be reading from them; h5py closes them once no longer referenced.
+    """
+    mtime = os.stat(filepath).st_mtime_ns
+    
+    with _open_files_lock:
+        cached = _open_files.pop(filepath, None)
+        if cached is None or cached[0] != mtime:
+            cached = (mtime, h5py.File(filepath, 'r'))
+        _open_files[filepath] = cached
+        
+        while len(_open_files) > _MAX_OPEN_FILES:
+            _open_files.popitem(last=False)
+    
+    return cached[1]
+
+
+def _clear_files():
+    """
+    Drop all cached file handles (exposed as query_swot_data.cache_clear)
+    """
+    with _open_files_lock:
+        _open_files.clear()
+
+
+def _tiles_inside(bbox, bounds):
+    """
+    Flag tiles whose bbox lies entirely inside the query box
+
+    bbox: (N, 4) array of (lon_min, lat_min, lon_max, lat_max) tile bboxes
+    bounds: (lat_min, lat_max, lon_min, lon_max) with longitudes already
+    normalized to -180/180; lon_min > lon_max denotes a query wrapping the
+    dateline.
+    """
+    lat_min, lat_max, lon_min, lon_max = bounds
+    
+    inside = (bbox[:, 1] >= lat_min) & (bbox[:, 3] <= lat_max)
+    if lon_min <= lon_max:
+        inside &= (bbox[:, 0] >= lon_min) & (bbox[:, 2] <= lon_max)
+    else:
+        inside &= (bbox[:, 0] >= lon_min) | (bbox[:, 2] <= lon_max)
+    
+    # Tiles crossing the antimeridian are indexed as two entries split at 0°,
+    # neither of which bounds the whole tile
+    inside &= (bbox[:, 0] != 0.0) & (bbox[:, 2] != 0.0)
+    
+    return inside
+
+
+def _select_lines(f, tiles, bounds):
+    """
+    Find the lines of a single file that intersect the query box
+
+    f: Open h5py.File, the same handle is passed to _read_lines()
+    tiles: List of (line_start, line_end, inside) tuples, where inside flags
+    tiles whose bbox lies entirely inside the query box.
+    bounds: (lat_min, lat_max, lon_min, lon_max) with longitudes already
+    normalized to -180/180.
+
+    Returns list of (line_slice, line_idx, coords) for every merged slice
+    with at least one selected line. line_idx are the selected lines relative
+    to line_slice.start and coords holds their latitude, longitude and time.
+    """
+    lat_min, lat_max, lon_min, lon_max = bounds
+    
+    # A line range only needs a pixel scan if none of its index entries
+    # lies entirely inside the query box
+    range_inside = defaultdict(bool)
+    for line_start, line_end, inside in tiles:
+        range_inside[(line_start, line_end)] |= inside
     
-    merged = []
-    current_start, current_end = sorted_ranges[0]
+    # Merge line ranges into contiguous slices
+    merged_slices = merge_line_ranges(list(range_inside))
     
-    for start, end in sorted_ranges[1:]:
-        if start <= current_end:  # Overlapping or adjacent
-            current_end = max(current_end, end)
-        else:  # Gap - start new range
-            merged.append(slice(current_start, current_end))
-            current_start, current_end = start, end
+    print(f"  {Path(f.filename).name}: {len(range_inside)} tiles → {len(merged_slices)} slices")
+    
+    selections = []
+    for line_slice in merged_slices:
+        lat = read_variable(f['latitude'], line_slice)
+        lon = read_variable(f['longitude'], line_slice)
+        
+        # Find lines where ANY pixel intersects the query box
+        lat_kernel = np.ascontiguousarray(lat, dtype=np.float64)
+        lon_kernel = np.ascontiguousarray(lon, dtype=np.float64)
+        line_mask = np.zeros(lat.shape[0], dtype=np.bool_)
+        for (line_start, line_end), inside in range_inside.items():
+            if line_start < line_slice.start or line_end > line_slice.stop:
+                continue
+            rows = slice(line_start - line_slice.start, line_end - line_slice.start)
+            tile_mask = np.empty(line_end - line_start, dtype=np.bool_)
+            if inside:
+                # Every valid pixel of a tile inside the query box is in it,
+                # so only lines entirely of fill values are dropped
+                _valid_line_mask(lat_kernel[rows], lon_kernel[rows], tile_mask)
+            else:
+                _bbox_line_mask(lat_kernel[rows], lon_kernel[rows], lat_min, lat_max,
+                                lon_min, lon_max, tile_mask)
+            line_mask[rows] |= tile_mask
+        
+        line_idx = np.flatnonzero(line_mask)
+        if line_idx.size == 0:
+            continue
+        
+        # Only read the rows from the first to the last selected line
+        span = slice(line_slice.start + line_idx[0], line_slice.start + line_idx[-1] + 1)
+        time = read_variable(f['time'], span)[line_idx - line_idx[0]]
+        selections.append((line_slice, line_idx, {
+            'latitude': lat[line_idx],
+            'longitude': lon[line_idx],
+            'time': decode_times(f['time'], time),
+        }))
+    
+    return selections
+
+
+def _read_lines(f, selections, variables, out, offset, mask_nadir=False):
+    """
+    Copy the selected lines of a single file into the output arrays
+
+    f: Open h5py.File the selections were made from
+    selections: Output of _select_lines() for this file
+    out: Dict of preallocated output arrays, written from row offset onwards
+    """
+    if mask_nadir:
+        nadir_lines = read_variable(f['i_num_line']).astype(np.intp)
+        nadir_pixels = read_variable(f['i_num_pixel']).astype(np.intp)
     
-    # Add the last range
-    merged.append(slice(current_start, current_end))
+    for line_slice, line_idx, coords in selections:
+        rows = slice(offset, offset + line_idx.size)
+        
+        for name, values in coords.items():
+            out[name][rows] = values
+        
+        # Only read the rows from the first to the last selected line,
+        # lines outside of them are never part of the output
+        span = slice(line_slice.start + line_idx[0], line_slice.start + line_idx[-1] + 1)
+        span_idx = line_idx - line_idx[0]
+        
+        for var in variables:
+            block = read_variable(f[var], span)
+            
+            if mask_nadir:
+                # Set nadir observations to NaN, see mask_nadir_observations()
+                in_span = (nadir_lines >= span.start) & (nadir_lines < span.stop)
+                block[nadir_lines[in_span] - span.start,
+                      nadir_pixels[in_span]] = np.nan
+            
+            out[var][rows] = block[span_idx]
+        
+        offset += line_idx.size
+
+
+def _map_files(func, files, *args):
+    """
+    Call func(f, *args) for every open file on a thread pool
+    Returns the results in the order of files
+
+    HDF5 reads do not overlap: h5py serializes every call into the HDF5
+    library behind a process-wide lock, so reading and decompression run
+    one thread at a time. What runs concurrently is the work between reads,
+    the line mask kernels (compiled nogil) and the NumPy decoding and copies
+    into the output arrays.
+    """
+    if not files:
+        return []
     
-    return merged
+    with ThreadPoolExecutor(max_workers=min(16, len(files))) as executor:
+        return list(executor.map(func, files, *args))
 
 
 def query_swot_data(index, lat_min, lat_max, lon_min, lon_max,
                     time_start=None, time_end=None,
                     variables=['ssha_unfiltered'],
-                    mask_nadir=False):
+                    mask_nadir=False, prefetch=False):
     """
     Query SWOT data within bounds, preserving (num_lines, num_pixels) structure
     
@@ -88,95 +346,120 @@ def query_swot_data(index, lat_min, lat_max, lon_min, lon_max,
     
     Args:
         lat_min, lat_max, lon_min, lon_max: Spatial bounds
-        time_start, time_end: Temporal bounds (optional, as pd.Timestamp)
+        time_start, time_end: Temporal bounds (optional, as np.datetime64,
+            pd.Timestamp or ISO string)
         variables: List of variables to load
         index_file: Path to index file
+        prefetch: Ask the OS to start reading all matching files into the page
+            cache up front (Linux only). Helps cold reads of many files on
+            network/NVMe storage; wasteful if the files are much larger than
+            the variables being read.
     
     Returns:
         xarray Dataset with (num_lines, num_pixels) dimensions
     """
     
     # Query for relevant tiles
-    tiles = index.query(lat_min, lat_max, lon_min, lon_max, 
-                       time_start, time_end)
+    tile_ids = index.query_tiles(lat_min, lat_max, lon_min, lon_max,
+                                 time_start, time_end)
     
-    print(f"Found {len(tiles)} relevant tiles")
+    print(f"Found {len(tile_ids)} relevant tiles")
+    
+    # Normalize query longitudes to -180/180 so that wrap-around queries
+    # (e.g. lon_min=350, lon_max=10) work correctly against the data.
+    lon_min_norm = ((lon_min + 180) % 360) - 180
+    lon_max_norm = ((lon_max + 180) % 360) - 180
+    bounds = (lat_min, lat_max, lon_min_norm, lon_max_norm)
     
     # Group tiles by file
+    tiles = index.get_tiles(tile_ids)
+    tiles_inside = _tiles_inside(tiles['bbox'], bounds)
     tiles_by_file = defaultdict(list)
-    for tile in tiles:
-        tiles_by_file[tile['file']].append(tile['line_range'])
+    for file_id, line_start, line_end, inside in zip(tiles['file_idx'].tolist(),
+                                                     tiles['line_start'].tolist(),
+                                                     tiles['line_end'].tolist(),
+                                                     tiles_inside.tolist()):
+        tiles_by_file[index.files[file_id]].append((line_start, line_end, inside))
     
     print(f"Spanning {len(tiles_by_file)} unique files")
     
-    # Load and filter data
-    datasets = []
-    false_hits = 0
+    if prefetch:
+        _prefetch_files(tiles_by_file)
     
-    for filepath, line_ranges in tiles_by_file.items():
-        ds = xr.open_dataset(filepath)
-
-        if mask_nadir:
-            ds = mask_nadir_observations(ds, variables)
-        
-        # Merge line ranges into contiguous slices
-        merged_slices = merge_line_ranges(line_ranges)
-        
-        print(f"  {Path(filepath).name}: {len(line_ranges)} tiles → {len(merged_slices)} slices")
-        
-        # Load all relevant slices
-        file_datasets = []
-        for line_slice in merged_slices:
-            ds_slice = ds.isel(num_lines=line_slice)
-            ds_slice = ds_slice[variables + ['latitude', 'longitude', 'time']]
-            
-            # Find lines where ANY pixel intersects the query box
-            lat = ds_slice.latitude
-            lon = ds_slice.longitude
-
-            # Normalize both data and query longitudes to -180/180 so that
-            # wrap-around queries (e.g. lon_min=350, lon_max=10) work correctly.
-            lon_norm = ((lon + 180) % 360) - 180
-            lon_min_norm = ((lon_min + 180) % 360) - 180
-            lon_max_norm = ((lon_max + 180) % 360) - 180
-
-            if lon_min_norm <= lon_max_norm:
-                lon_in_bounds = (lon_norm >= lon_min_norm) & (lon_norm <= lon_max_norm)
-            else:
-                # Wrap-around: pixel is in bounds if it's east of lon_min OR west of lon_max
-                lon_in_bounds = (lon_norm >= lon_min_norm) | (lon_norm <= lon_max_norm)
-
-            # For each line, check if ANY pixel is in the box
-            line_mask = (
-                ((lat >= lat_min) & (lat <= lat_max) & lon_in_bounds)
-                .any(dim='num_pixels')  # True if ANY pixel in the line is in bounds
-            )
-            
-            # Select only lines that have at least one pixel in bounds
-            ds_filtered = ds_slice.isel(num_lines=line_mask)
-            
-            if ds_filtered.sizes['num_lines'] > 0:
-                file_datasets.append(ds_filtered)
-        
-        # Concatenate slices from this file
-        if file_datasets:
-            file_data = xr.concat(file_datasets, dim='num_lines')
-            datasets.append(file_data)
-        else:
-            false_hits += 1
-        
-        ds.close()
+    # Open every file once for both passes, so that a file replaced on disk
+    # in between is not read with the line selection of its old version
+    filepaths = list(tiles_by_file)
+    files = [_open_file(filepath) for filepath in filepaths]
+    
+    # First pass: find the selected lines of every file, keeping their
+    # coordinates since they are part of the output
+    selections = _map_files(_select_lines, files,
+                            [tiles_by_file[fp] for fp in filepaths],
+                            [bounds] * len(files))
+    
+    num_lines = [sum(line_idx.size for _, line_idx, _ in file_selections)
+                 for file_selections in selections]
+    false_hits = sum(n == 0 for n in num_lines)
 
     print(f"False hit rate: {false_hits}/{len(tiles_by_file)} files opened needlessly, if this is high reduce tile_size to reduce I/O")
     
-    # Concatenate all results
-    if datasets:
-        result = xr.concat(datasets, dim='num_lines')
-        result = result.set_coords("time")
-        result = result.sortby('time')
-        result = result.assign_coords(
+    if sum(num_lines) == 0:
+        return None
+    
+    # Preallocate the output from the layout of the first file with data
+    hits = [i for i, n in enumerate(num_lines) if n > 0]
+    files = [files[i] for i in hits]
+    selections = [selections[i] for i in hits]
+    offsets = np.cumsum([0] + [num_lines[i] for i in hits[:-1]]).tolist()
+    total_lines = sum(num_lines)
+    
+    coord_names = ['latitude', 'longitude', 'time']
+    variables = [var for var in variables if var not in coord_names]
+    
+    out = {}
+    data_vars = {}
+    f = files[0]
+    for var in variables + coord_names:
+        dset = f[var]
+        if var == 'time':
+            dtype = np.dtype('datetime64[ns]')
+            attrs = variable_attrs(dset, exclude=('units', 'calendar'))
+        else:
+            dtype = decoded_dtype(dset)
+            attrs = variable_attrs(dset)
+        out[var] = np.empty((total_lines,) + dset.shape[1:], dtype=dtype)
+        data_vars[var] = (dimension_names(dset), out[var], attrs,
+                          variable_encoding(dset, times=(var == 'time'),
+                                            shape=out[var].shape))
+    global_attrs = variable_attrs(f)
+    
+    # Variables named in CF coordinates attributes are coordinates, as
+    # xr.open_dataset would decode them; time always is one
+    coords = [var for var in data_vars
+              if var in coordinate_names(f) or var == 'time']
+    
+    # Second pass: read the selected lines straight into the output arrays
+    _map_files(_read_lines, files, selections,
+               [variables] * len(files), [out] * len(files),
+               offsets, [mask_nadir] * len(files))
+    
+    # Sort lines by time on the plain arrays (stable, like Dataset.sortby)
+    # so xarray only has to wrap the final arrays
+    order = np.argsort(out['time'], kind='stable')
+    data_vars = {var: (dims, values[order], attrs, encoding)
+                 for var, (dims, values, attrs, encoding) in data_vars.items()}
+    
+    result = xr.Dataset(data_vars, attrs=global_attrs)
+    result = result.set_coords(coords)
+    result = result.assign_coords(
         num_lines=np.arange(result.sizes["num_lines"])
     )
-        return result
-    else:
-        return None
\ No newline at end of file
+    return result
+
+
+# Release the cached file handles and their file descriptors, once no query
+# still uses them. A cached read handle also holds the HDF5 file lock, so a
+# process writing to one of the queried files (e.g. appending with netCDF4)
+# fails to open it until this is called in the querying process (or
+# HDF5_USE_FILE_LOCKING=FALSE is set).
+query_swot_data.cache_clear = _clear_files
@@ -3,7 +3,7 @@ Command-line interface for SWOT spatial indexing and querying
 """
 
 import argparse
-import pandas as pd
+import numpy as np
 from pathlib import Path
 
 from SwotDB import SWOTSpatialIndex, query_swot_data
@@ -14,7 +14,7 @@ def build_index(args):
     print(f"Building index: {args.index_file}")
     print(f"Tile size: {args.tile_size} lines")
 
-    if args.load_existing and Path(f"{args.index_file}_metadata.pkl").exists():
+    if args.load_existing and SWOTSpatialIndex.exists(args.index_file):
         print("Loading existing index...")
         index = SWOTSpatialIndex.load(args.index_file)
     else:
@@ -25,6 +25,7 @@ def build_index(args):
         args.data_dir,
         pattern=args.pattern,
         tile_size=args.tile_size,
+        max_workers=args.workers,
     )
 
     index.save()
@@ -43,8 +44,8 @@ def query_index(args):
 
     index = SWOTSpatialIndex.load(args.index_file)
 
-    time_start = pd.Timestamp(args.time_start) if args.time_start else None
-    time_end = pd.Timestamp(args.time_end) if args.time_end else None
+    time_start = np.datetime64(args.time_start, 'ns') if args.time_start else None
+    time_end = np.datetime64(args.time_end, 'ns') if args.time_end else None
 
     variables = args.variables.split(",") if args.variables else ["ssha_unfiltered"]
 
@@ -93,7 +94,7 @@ def info_index(args):
     stats = index.get_stats()
 
     print("\nIndex Information:")
-    print(f"  Index file: {args.index_file}_metadata.pkl")
+    print(f"  Index file: {index.metadata_file}")
     print(f"  Files indexed: {stats['num_files']}")
     print(f"  Total tiles: {stats['num_tiles']}")
     print(f"  Tile size: {stats['tile_size']} lines")
@@ -133,6 +134,7 @@ def main():
     build_parser.add_argument("--tile-size", type=int, default=493)
     build_parser.add_argument("--pattern", default="*.nc")
     build_parser.add_argument("--load-existing", action="store_true")
+    build_parser.add_argument("--workers", type=int, default=None)
     build_parser.set_defaults(func=build_index)
 
     query_parser = subparsers.add_parser("query", help="Query spatial index")
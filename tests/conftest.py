@@ -0,0 +1,60 @@
+import numpy as np
+import pandas as pd
+import pytest
+import xarray as xr
+
+
+def write_swath(path, lat0, lon0, t0, nan_lines=(), num_lines=400, num_pixels=15):
+    """
+    Synthetic SWOT-like swath file: packed coordinates, fill values and
+    zlib-compressed, chunked variables like the real products
+    """
+    rng = np.random.default_rng(abs(int(lat0 * 100 + lon0)))
+    i = np.arange(num_lines)[:, None]
+    j = np.arange(num_pixels)[None, :]
+
+    lat = lat0 + i * 0.01 + j * 0.002
+    lon = (lon0 + i * 0.004 + (j - num_pixels // 2) * 0.02) % 360
+    lat[list(nan_lines)] = np.nan
+    lon[list(nan_lines)] = np.nan
+    ssha = rng.normal(size=lat.shape)
+    ssha[rng.random(lat.shape) < 0.05] = np.nan
+    sig0 = rng.normal(size=lat.shape).astype(np.float32)
+    time = pd.Timestamp(t0) + pd.to_timedelta(np.arange(num_lines) * 0.5, unit="s")
+
+    ds = xr.Dataset(
+        {
+            "ssha_unfiltered": (("num_lines", "num_pixels"), ssha, {"units": "m"}),
+            "sig0": (("num_lines", "num_pixels"), sig0, {"units": "1"}),
+        },
+        coords={
+            "latitude": (("num_lines", "num_pixels"), lat, {"units": "degrees_north"}),
+            "longitude": (("num_lines", "num_pixels"), lon, {"units": "degrees_east"}),
+            "time": (("num_lines",), time.values),
+        },
+        attrs={"title": "synthetic"},
+    )
+    compressed = {"zlib": True, "complevel": 4, "shuffle": True,
+                  "chunksizes": (100, num_pixels)}
+    packed = {"dtype": "int32", "scale_factor": 1e-6,
+              "_FillValue": np.int32(2147483647), **compressed}
+    ds.to_netcdf(path, engine="h5netcdf", encoding={
+        "latitude": packed,
+        "longitude": packed,
+        "ssha_unfiltered": {"dtype": "int32", "scale_factor": 1e-4,
+                            "_FillValue": np.int32(2147483647), **compressed},
+        "sig0": {"_FillValue": np.float32(9.96921e36), **compressed},
+        "time": {"units": "seconds since 2000-01-01", "calendar": "gregorian",
+                 "dtype": "float64"},
+    })
+
+
+@pytest.fixture(scope="session")
+def swath_files(tmp_path_factory):
+    """Three swath files: a has fill-value lines, c crosses the antimeridian"""
+    tmp_path = tmp_path_factory.mktemp("swaths")
+    filepaths = [str(tmp_path / name) for name in ("a.nc", "b.nc", "c.nc")]
+    write_swath(filepaths[0], 30, 290, "2024-09-20", nan_lines=(5, 6, 7, 200, 201))
+    write_swath(filepaths[1], 31, 291, "2024-09-22")
+    write_swath(filepaths[2], -2, 179, "2024-09-25")
+    return filepaths
@@ -0,0 +1,147 @@
+import h5py
+import numpy as np
+import pandas as pd
+import pytest
+import xarray as xr
+
+from SwotDB.src.h5io import (read_variable, decoded_dtype, decode_times,
+                             variable_attrs, variable_encoding, coordinate_names,
+                             dimension_names)
+
+VARIABLES = ["packed", "packed_int16", "unpacked", "latitude", "quality_flag",
+             "counts", "flag"]
+
+ENCODING_KEYS = ("dtype", "_FillValue", "missing_value", "scale_factor", "add_offset",
+                 "units", "calendar", "zlib", "complevel", "compression",
+                 "compression_opts", "shuffle", "fletcher32", "contiguous", "chunksizes")
+
+
+@pytest.fixture(scope="module")
+def nc_file(tmp_path_factory):
+    """Small netCDF file covering the CF encodings found in SWOT products"""
+    rng = np.random.default_rng(0)
+    shape = (20, 7)
+
+    packed = rng.normal(size=shape)
+    packed[3, 2] = packed[10, :] = np.nan
+    unpacked = rng.normal(size=shape).astype(np.float32)
+    unpacked[5, 5] = np.nan
+    quality_flag = rng.integers(0, 5, shape).astype(np.float64)
+    quality_flag[2, :] = np.nan
+    counts = rng.integers(-100, 100, shape).astype(np.float64)
+    counts[7, 3] = np.nan
+    time = pd.Timestamp("2024-09-20") + pd.to_timedelta(np.arange(shape[0]) * 0.5, unit="s")
+
+    dims = ("num_lines", "num_pixels")
+    ds = xr.Dataset(
+        {
+            "packed": (dims, packed, {"units": "m", "long_name": "packed"}),
+            "packed_int16": (dims, packed, {"units": "m"}),
+            "unpacked": (dims, unpacked, {"units": "1"}),
+            "quality_flag": (dims, quality_flag),
+            "counts": (dims, counts),
+            "flag": (("num_lines",), np.arange(shape[0], dtype=np.int8)),
+        },
+        coords={
+            "latitude": (dims, rng.uniform(-60, 60, shape), {"units": "degrees_north"}),
+            "time": (("num_lines",), time.values, {"long_name": "time in UTC"}),
+        },
+        attrs={"title": "synthetic", "pass_number": np.int16(5)},
+    )
+    encoding = {
+        "packed": {"dtype": "int32", "scale_factor": 1e-4, "add_offset": 0.5,
+                   "_FillValue": np.int32(2147483647)},
+        "packed_int16": {"dtype": "int16", "scale_factor": np.float32(1e-3),
+                         "add_offset": np.float32(0.0), "_FillValue": np.int16(32767)},
+        "unpacked": {"_FillValue": np.float32(9.96921e36)},
+        "quality_flag": {"dtype": "uint8", "_FillValue": np.uint8(255)},
+        "counts": {"dtype": "int16", "_FillValue": np.int16(-32768)},
+        "latitude": {"dtype": "int32", "scale_factor": 1e-6, "_FillValue": np.int32(2147483647)},
+        "time": {"units": "seconds since 2000-01-01 00:00:00.0", "calendar": "gregorian",
+                 "dtype": "float64"},
+    }
+    path = tmp_path_factory.mktemp("h5io") / "swath.nc"
+    ds.to_netcdf(path, engine="h5netcdf", encoding=encoding)
+    return path
+
+
+@pytest.fixture(scope="module")
+def files(nc_file):
+    with h5py.File(nc_file, "r") as f, xr.open_dataset(nc_file) as ds:
+        yield f, ds.load()
+
+
+@pytest.mark.parametrize("var", VARIABLES)
+def test_read_variable_matches_xarray(files, var):
+    f, ds = files
+    values = read_variable(f[var])
+
+    assert values.dtype == ds[var].dtype
+    assert decoded_dtype(f[var]) == ds[var].dtype
+    np.testing.assert_array_equal(values, ds[var].values)
+
+
+def test_read_variable_selection(files):
+    f, ds = files
+    np.testing.assert_array_equal(read_variable(f["packed"], slice(8, 12)),
+                                  ds["packed"].values[8:12])
+
+
+def test_decode_times(files):
+    f, ds = files
+    times = decode_times(f["time"], read_variable(f["time"]))
+
+    assert times.dtype == np.dtype("datetime64[ns]")
+    np.testing.assert_array_equal(times, ds["time"].values)
+
+
+@pytest.mark.parametrize("var", VARIABLES)
+def test_variable_attrs_and_dims(files, var):
+    f, ds = files
+    assert variable_attrs(f[var]) == ds[var].attrs
+    assert dimension_names(f[var]) == ds[var].dims
+
+
+def test_time_and_global_attrs(files):
+    f, ds = files
+    assert variable_attrs(f["time"], exclude=("units", "calendar")) == ds["time"].attrs
+    assert variable_attrs(f) == ds.attrs
+
+
+def _assert_encoding_equal(encoding, expected):
+    expected = {key: value for key, value in expected.items() if key in ENCODING_KEYS}
+    if not expected["zlib"]:
+        # xarray reports complevel 0 for uncompressed variables
+        expected.pop("complevel", None)
+    assert encoding.keys() == expected.keys()
+    for key, value in expected.items():
+        np.testing.assert_equal(encoding[key], value, err_msg=key)
+
+
+@pytest.mark.parametrize("var", VARIABLES + ["time"])
+def test_variable_encoding(files, var):
+    f, ds = files
+    _assert_encoding_equal(variable_encoding(f[var], times=(var == "time")),
+                           ds[var].encoding)
+
+
+@pytest.mark.parametrize("var", ["ssha_unfiltered", "sig0", "latitude", "longitude", "time"])
+def test_variable_encoding_compressed(swath_files, var):
+    with h5py.File(swath_files[0], "r") as f, xr.open_dataset(swath_files[0]) as ds:
+        encoding = variable_encoding(f[var], times=(var == "time"))
+        _assert_encoding_equal(encoding, ds[var].encoding)
+
+        if var != "time":
+            assert encoding["zlib"] and encoding["shuffle"]
+            # Chunks are clamped to the shape of a smaller output
+            shape = (30,) + f[var].shape[1:]
+            assert variable_encoding(f[var], shape=shape)["chunksizes"] == shape
+
+
+def test_coordinate_names(files, swath_files):
+    f, ds = files
+    assert coordinate_names(f) == {"latitude", "time"}
+    assert coordinate_names(f) == set(ds.coords)
+
+    with h5py.File(swath_files[0], "r") as f, xr.open_dataset(swath_files[0]) as ds:
+        assert coordinate_names(f) == set(ds.coords)
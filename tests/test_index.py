@@ -0,0 +1,319 @@
+import json
+import pickle
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+import xarray as xr
+
+from SwotDB import SWOTSpatialIndex
+from SwotDB.src import index as index_module
+
+TILE_SIZE = 20
+
+# Box edges are kept away from tile edges, where float32 rounding of the
+# stored bboxes may legitimately add a touching tile
+BOXES = [
+    (25, 40, 280, 300),
+    (31.013, 32.987, 289.513, 291.487),
+    (-5, 5, 179.5, 180.5),    # across the antimeridian
+    (-5, 5, 350, 10),         # wrap-around query, no data
+    (-0.513, 0.487, 178.8, 179.2),
+]
+
+
+def _reference_tiles(filepaths, tile_size=TILE_SIZE):
+    """Tiles of the files, computed with plain xarray as the baseline index did"""
+    tiles = []
+    for filepath in filepaths:
+        with xr.open_dataset(filepath) as ds:
+            time_range = (pd.Timestamp(ds.time.min().values),
+                          pd.Timestamp(ds.time.max().values))
+            for line_start in range(0, ds.sizes["num_lines"], tile_size):
+                line_end = min(line_start + tile_size, ds.sizes["num_lines"])
+                lines = slice(line_start, line_end)
+                lat = ds.latitude.isel(num_lines=lines)
+                lon = ((ds.longitude.isel(num_lines=lines) + 180) % 360) - 180
+                lat_min, lat_max = float(lat.min()), float(lat.max())
+                lon_min, lon_max = float(lon.min()), float(lon.max())
+                if lon_max - lon_min > 180:
+                    lon_ranges = [(lon_min, 0.0), (0.0, lon_max)]
+                else:
+                    lon_ranges = [(lon_min, lon_max)]
+                for tile_lon_min, tile_lon_max in lon_ranges:
+                    tiles.append({
+                        "file": filepath,
+                        "line_range": (line_start, line_end),
+                        "bbox": (tile_lon_min, lat_min, tile_lon_max, lat_max),
+                        "time_range": time_range,
+                    })
+    return tiles
+
+
+def _reference_query(tiles, lat_min, lat_max, lon_min, lon_max,
+                     time_start=None, time_end=None):
+    """Tiles whose bbox intersects the box, by brute force"""
+    lon_min = ((lon_min + 180) % 360) - 180
+    lon_max = ((lon_max + 180) % 360) - 180
+    found = set()
+    for tile in tiles:
+        tile_lon_min, tile_lat_min, tile_lon_max, tile_lat_max = tile["bbox"]
+        if tile_lat_max < lat_min or tile_lat_min > lat_max:
+            continue
+        if lon_min <= lon_max:
+            if tile_lon_max < lon_min or tile_lon_min > lon_max:
+                continue
+        elif tile_lon_max < lon_min and tile_lon_min > lon_max:
+            continue
+        if time_start is not None and tile["time_range"][1] < pd.Timestamp(time_start):
+            continue
+        if time_end is not None and tile["time_range"][0] > pd.Timestamp(time_end):
+            continue
+        found.add((tile["file"], tile["line_range"]))
+    return found
+
+
+def _query(index, *bounds, **kwargs):
+    return {(tile["file"], tile["line_range"]) for tile in index.query(*bounds, **kwargs)}
+
+
+@pytest.fixture(scope="module")
+def index(swath_files, tmp_path_factory):
+    index = SWOTSpatialIndex(str(tmp_path_factory.mktemp("index") / "swot_index"),
+                             tile_size=TILE_SIZE, autosave_interval=0)
+    for filepath in swath_files:
+        index.add_file(filepath)
+    return index
+
+
+def test_tiles_match_xarray(index, swath_files):
+    expected = _reference_tiles(swath_files)
+    assert index.num_tiles == len(expected)
+
+    for tile in expected:
+        [found] = [t for t in index.query(*tile["bbox"][1::2], *tile["bbox"][::2])
+                   if (t["file"], t["line_range"]) == (tile["file"], tile["line_range"])
+                   and np.allclose(t["bbox"], tile["bbox"], atol=1e-4)]
+        # Stored bboxes are rounded outward, never inward
+        assert found["bbox"][0] <= tile["bbox"][0] and found["bbox"][1] <= tile["bbox"][1]
+        assert found["bbox"][2] >= tile["bbox"][2] and found["bbox"][3] >= tile["bbox"][3]
+
+
+@pytest.mark.parametrize("bounds", BOXES)
+def test_query_matches_xarray(index, swath_files, bounds):
+    expected = _reference_query(_reference_tiles(swath_files), *bounds)
+    assert _query(index, *bounds) == expected
+
+
+def test_query_time_filter(index, swath_files):
+    bounds = (-90, 90, -179.99, 179.99)
+    expected = _reference_query(_reference_tiles(swath_files), *bounds,
+                                "2024-09-21", "2024-09-23")
+    found = _query(index, *bounds, time_start="2024-09-21", time_end="2024-09-23")
+
+    assert found == expected
+    assert {filepath for filepath, _ in found} == {swath_files[1]}
+
+
+@pytest.mark.parametrize("convert", [
+    str, pd.Timestamp, np.datetime64, lambda t: pd.Timestamp(t).to_pydatetime(),
+])
+def test_query_time_bound_types(index, swath_files, convert):
+    bounds = (-90, 90, -179.99, 179.99)
+    # End of file a, to the nanosecond: bounds are inclusive
+    time_start, time_end = "2024-09-20T00:03:19.5", "2024-09-22"
+
+    found = _query(index, *bounds, time_start=convert(time_start),
+                   time_end=convert(time_end))
+
+    assert found == _reference_query(_reference_tiles(swath_files), *bounds,
+                                     time_start, time_end)
+    assert {filepath for filepath, _ in found} == set(swath_files[:2])
+
+
+def test_save_load_roundtrip(index, swath_files):
+    index.save()
+
+    loaded = SWOTSpatialIndex.load(index.index_file)
+
+    assert loaded.num_tiles == index.num_tiles
+    assert loaded.tile_size == TILE_SIZE
+    assert loaded.indexed_files == set(swath_files)
+    assert loaded.base_path == index.base_path
+    for bounds in BOXES:
+        assert _query(loaded, *bounds) == _query(index, *bounds)
+
+
+def test_saved_files(index, swath_files):
+    index.save()
+
+    with open(f"{index.index_file}_metadata.json") as f:
+        header = json.load(f)
+    assert header["num_tiles"] == index.num_tiles
+    assert set(header["indexed_files"]) == set(swath_files)
+    assert {f"{name}.npy" for name in index._columns()} <= {
+        path.name for path in Path(index.tiles_dir).iterdir()}
+    assert SWOTSpatialIndex.exists(index.index_file)
+    assert not SWOTSpatialIndex.exists(index.index_file + "_missing")
+
+    loaded = SWOTSpatialIndex.load(index.index_file)
+    for name, column in loaded._columns().items():
+        assert isinstance(column, np.memmap), name
+
+
+def test_autosave(swath_files, tmp_path):
+    index = SWOTSpatialIndex(str(tmp_path / "swot_index"), tile_size=TILE_SIZE,
+                             autosave_interval=2)
+    for filepath in swath_files:
+        index.add_file(filepath)
+
+    # Only the first two files were autosaved
+    loaded = SWOTSpatialIndex.load(index.index_file)
+    tiles = _reference_tiles(swath_files[:2])
+    assert loaded.indexed_files == set(swath_files[:2])
+    assert loaded.num_tiles == len(tiles)
+    for bounds in BOXES:
+        assert _query(loaded, *bounds) == _reference_query(tiles, *bounds)
+
+
+def test_load_legacy_index(swath_files, tmp_path):
+    tiles = _reference_tiles(swath_files)
+    with open(tmp_path / "legacy_metadata.pkl", "wb") as f:
+        pickle.dump({
+            "metadata": dict(enumerate(tiles)),
+            "file_counter": len(tiles),
+            "indexed_files": set(swath_files),
+            "tile_size": TILE_SIZE,
+            "base_path": str(Path(swath_files[0]).parent),
+        }, f)
+
+    loaded = SWOTSpatialIndex.load(str(tmp_path / "legacy"))
+    loaded.save()
+    converted = SWOTSpatialIndex.load(str(tmp_path / "legacy"))
+
+    assert (tmp_path / "legacy_metadata.json").exists()
+    for idx in (loaded, converted):
+        assert idx.num_tiles == len(tiles)
+        assert idx.indexed_files == set(swath_files)
+        for bounds in BOXES:
+            assert _query(idx, *bounds) == _reference_query(tiles, *bounds)
+
+
+def test_set_base_path(swath_files, tmp_path):
+    index = SWOTSpatialIndex(str(tmp_path / "swot_index"), tile_size=TILE_SIZE,
+                             autosave_interval=0)
+    index.add_file(swath_files[0])
+    index.save()
+
+    moved = tmp_path / "moved"
+    loaded = SWOTSpatialIndex.load(index.index_file, new_base_path=str(moved))
+
+    expected = str(moved / Path(swath_files[0]).name)
+    assert loaded.base_path == str(moved)
+    assert loaded.indexed_files == {expected}
+    assert {filepath for filepath, _ in _query(loaded, *BOXES[0])} == {expected}
+
+
+def test_append_to_loaded_index(swath_files, tmp_path):
+    index = SWOTSpatialIndex(str(tmp_path / "swot_index"), tile_size=TILE_SIZE,
+                             autosave_interval=0)
+    for filepath in swath_files[:2]:
+        index.add_file(filepath)
+    index.save()
+
+    loaded = SWOTSpatialIndex.load(index.index_file, autosave_interval=0)
+    loaded.add_file(swath_files[2])
+    loaded.save()
+    reloaded = SWOTSpatialIndex.load(index.index_file)
+
+    tiles = _reference_tiles(swath_files)
+    assert reloaded.num_tiles == len(tiles)
+    assert reloaded.indexed_files == set(swath_files)
+    for bounds in BOXES:
+        assert _query(loaded, *bounds) == _reference_query(tiles, *bounds)
+        assert _query(reloaded, *bounds) == _reference_query(tiles, *bounds)
+
+
+def _tile_records(index):
+    """Sorted (file, line_start, line_end, bbox, t_min, t_max) of every tile"""
+    index._flush_pending()
+    columns = index._columns()
+    return sorted(zip([index._files[i] for i in columns["file_idx"].tolist()],
+                      columns["line_start"].tolist(), columns["line_end"].tolist(),
+                      map(tuple, columns["bbox"].tolist()),
+                      columns["t_min"].tolist(), columns["t_max"].tolist()))
+
+
+def test_add_files_from_directory(swath_files, tmp_path):
+    sequential = SWOTSpatialIndex(str(tmp_path / "sequential"), tile_size=TILE_SIZE,
+                                  autosave_interval=0)
+    for filepath in swath_files:
+        sequential.add_file(filepath)
+
+    parallel = SWOTSpatialIndex(str(tmp_path / "parallel"), tile_size=TILE_SIZE,
+                                autosave_interval=0)
+    parallel.add_files_from_directory(Path(swath_files[0]).parent, max_workers=2)
+
+    assert parallel.indexed_files == sequential.indexed_files
+    assert _tile_records(parallel) == _tile_records(sequential)
+    assert _tile_records(SWOTSpatialIndex.load(parallel.index_file)) == _tile_records(sequential)
+
+
+def _random_boxes(seed, count=200):
+    """Random query boxes over the swaths, including dateline wrap-arounds"""
+    rng = np.random.default_rng(seed)
+    for _ in range(count):
+        lat_min = rng.uniform(-10, 40)
+        lon_min = rng.uniform(170, 300)
+        yield (lat_min, lat_min + rng.uniform(0.01, 10),
+               lon_min, (lon_min + rng.uniform(0.01, 30)) % 360)
+
+
+def _edge_boxes(index, seed=1, count=100):
+    """Boxes with an edge just inside or outside a tile edge"""
+    rng = np.random.default_rng(seed)
+    index._flush_pending()
+    for lon_min, lat_min, lon_max, lat_max in index._bbox[rng.integers(0, index.num_tiles, count)]:
+        offset = rng.choice([-1e-4, 1e-4, -0.005, 0.005])
+        yield (lat_max - offset, lat_max + 1, lon_min - 1, lon_max + 1)
+        yield (lat_min - 1, lat_min + offset, lon_min - 1, lon_max + 1)
+        yield (lat_min - 1, lat_max + 1, lon_max - offset, lon_max + 1)
+        yield (lat_min - 1, lat_max + 1, lon_min - 1, lon_min + offset)
+
+
+def _scan_tiles(index, lat_min, lat_max, lon_min, lon_max, time_start=None, time_end=None,
+                margin=0.0):
+    """Tile ids matching the box, grown by margin degrees, by testing every float bbox"""
+    lon_min = ((lon_min - margin + 180) % 360) - 180
+    lon_max = ((lon_max + margin + 180) % 360) - 180
+    lat_min, lat_max = lat_min - margin, lat_max + margin
+    index._flush_pending()
+    bbox = index._bbox.astype(np.float64)
+    keep = (bbox[:, 1] <= lat_max) & (bbox[:, 3] >= lat_min)
+    if lon_min > lon_max:
+        keep &= (bbox[:, 2] >= lon_min) | (bbox[:, 0] <= lon_max)
+    else:
+        keep &= (bbox[:, 0] <= lon_max) & (bbox[:, 2] >= lon_min)
+    if time_start is not None:
+        keep &= index._t_max >= np.datetime64(time_start, "ns").astype(np.int64)
+    if time_end is not None:
+        keep &= index._t_min <= np.datetime64(time_end, "ns").astype(np.int64)
+    return np.flatnonzero(keep)
+
+
+# Force the lat_max binary search prefilter (share 1) or the full scan (share 0)
+@pytest.mark.parametrize("share", [0.0, 1.0])
+def test_query_tiles_matches_scan(index, share, monkeypatch):
+    monkeypatch.setattr(index_module, "_PREFILTER_MAX_SHARE", share)
+
+    for bounds in list(_random_boxes(0)) + list(_edge_boxes(index)) + BOXES:
+        found = index.query_tiles(*bounds)
+        # The quantized bboxes never drop a tile the float bboxes match, and
+        # only add tiles within one quantization step (0.01°) of the box
+        assert np.isin(_scan_tiles(index, *bounds), found).all()
+        assert np.isin(found, _scan_tiles(index, *bounds, margin=0.01)).all()
+
+    np.testing.assert_array_equal(
+        index.query_tiles(25, 40, 280, 300, "2024-09-21", "2024-09-23"),
+        _scan_tiles(index, 25, 40, 280, 300, "2024-09-21", "2024-09-23"))
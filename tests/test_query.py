@@ -0,0 +1,184 @@
+import gc
+import os
+import shutil
+
+import h5py
+import numpy as np
+import pytest
+import xarray as xr
+
+from SwotDB import SWOTSpatialIndex, query_swot_data
+from SwotDB.src.query import merge_line_ranges
+
+VARIABLES = ["ssha_unfiltered", "sig0"]
+
+
+def _reference_query(filepaths, lat_min, lat_max, lon_min, lon_max, variables,
+                     time_start=None, time_end=None):
+    """Query by scanning every line of every file with plain xarray"""
+    lon_min = ((lon_min + 180) % 360) - 180
+    lon_max = ((lon_max + 180) % 360) - 180
+
+    datasets = []
+    for filepath in filepaths:
+        with xr.open_dataset(filepath) as ds:
+            # Like the index, time bounds select whole files
+            if time_start is not None and ds["time"].max() < np.datetime64(time_start):
+                continue
+            if time_end is not None and ds["time"].min() > np.datetime64(time_end):
+                continue
+            lon = ((ds["longitude"] + 180) % 360) - 180
+            if lon_min > lon_max:
+                in_lon = (lon >= lon_min) | (lon <= lon_max)
+            else:
+                in_lon = (lon >= lon_min) & (lon <= lon_max)
+            in_box = (ds["latitude"] >= lat_min) & (ds["latitude"] <= lat_max) & in_lon
+            lines = np.flatnonzero(in_box.any("num_pixels").values)
+            if lines.size:
+                datasets.append(ds[variables + ["latitude", "longitude", "time"]]
+                                .isel(num_lines=lines).load())
+
+    result = xr.concat(datasets, dim="num_lines").set_coords("time").sortby("time")
+    return result.assign_coords(num_lines=np.arange(result.sizes["num_lines"]))
+
+
+@pytest.fixture(scope="module")
+def swaths(swath_files, tmp_path_factory):
+    index = SWOTSpatialIndex(str(tmp_path_factory.mktemp("query") / "swot_index"),
+                             tile_size=20, autosave_interval=0)
+    for filepath in swath_files:
+        index.add_file(filepath)
+
+    return index, swath_files
+
+
+@pytest.mark.parametrize("bounds", [
+    (25, 40, 280, 300),      # every tile of both northern swaths inside the box
+    (31, 33, 289.5, 291.5),  # partial overlap
+    (-5, 5, 179.5, 180.5),   # query across the antimeridian
+])
+def test_query_matches_xarray(swaths, bounds):
+    index, filepaths = swaths
+
+    result = query_swot_data(index, *bounds, variables=VARIABLES)
+    expected = _reference_query(filepaths, *bounds, VARIABLES)
+
+    xr.testing.assert_identical(result, expected)
+    for var in expected.variables:
+        keys = ["dtype", "scale_factor", "add_offset", "_FillValue", "units", "calendar",
+                "zlib", "shuffle"]
+        if expected[var].encoding.get("zlib"):
+            keys.append("complevel")
+        for key in keys:
+            if key in expected[var].encoding:
+                np.testing.assert_equal(result[var].encoding[key], expected[var].encoding[key])
+
+
+def test_query_time_bounds(swaths):
+    index, filepaths = swaths
+    bounds = (-90, 90, -179.99, 179.99)
+
+    result = query_swot_data(index, *bounds, time_start="2024-09-21",
+                             time_end=np.datetime64("2024-09-26"), variables=VARIABLES)
+    expected = _reference_query(filepaths, *bounds, VARIABLES,
+                                "2024-09-21", "2024-09-26")
+
+    xr.testing.assert_identical(result, expected)
+    assert result["time"].values.min() >= np.datetime64("2024-09-22")
+
+
+def test_query_outside_data(swaths):
+    index, _ = swaths
+    assert query_swot_data(index, -60, -50, 0, 10) is None
+
+
+def test_query_keeps_compression(swaths, tmp_path):
+    index, filepaths = swaths
+    bounds = (31, 33, 289.5, 291.5)
+
+    query_swot_data(index, *bounds, variables=VARIABLES).to_netcdf(
+        tmp_path / "result.nc", engine="h5netcdf")
+    _reference_query(filepaths, *bounds, VARIABLES).to_netcdf(
+        tmp_path / "expected.nc", engine="h5netcdf")
+
+    with h5py.File(tmp_path / "result.nc", "r") as result, \
+            h5py.File(tmp_path / "expected.nc", "r") as expected:
+        for var in VARIABLES + ["latitude", "longitude"]:
+            assert result[var].compression == expected[var].compression == "gzip"
+            assert result[var].compression_opts == expected[var].compression_opts
+            assert result[var].shuffle == expected[var].shuffle
+
+
+@pytest.mark.parametrize("line_ranges, expected", [
+    ([], []),
+    ([(0, 500), (500, 1000), (2000, 2500)], [slice(0, 1000), slice(2000, 2500)]),
+    ([(0, 500), (400, 600), (100, 200)], [slice(0, 600)]),                  # overlapping
+    ([(2000, 2500), (0, 500), (500, 1000)], [slice(0, 1000), slice(2000, 2500)]),  # unsorted
+    ([(0, 1000), (100, 200), (200, 300), (1001, 1100)], [slice(0, 1000), slice(1001, 1100)]),
+    ([(10, 20), (10, 20)], [slice(10, 20)]),                                # duplicates
+])
+def test_merge_line_ranges(line_ranges, expected):
+    assert merge_line_ranges(line_ranges) == expected
+
+
+def test_merge_line_ranges_random():
+    rng = np.random.default_rng(0)
+    for _ in range(200):
+        starts = rng.integers(0, 2000, rng.integers(1, 30))
+        line_ranges = [(start, start + length) for start, length
+                       in zip(starts.tolist(), rng.integers(1, 200, starts.size).tolist())]
+
+        # Sequential merge of the sorted ranges
+        expected = []
+        for start, end in sorted(line_ranges):
+            if expected and start <= expected[-1].stop:
+                expected[-1] = slice(expected[-1].start, max(expected[-1].stop, end))
+            else:
+                expected.append(slice(start, end))
+
+        assert merge_line_ranges(line_ranges) == expected
+
+
+def _open_paths(directory):
+    """Paths under directory this process has open file descriptors for"""
+    paths = []
+    for fd in os.listdir("/proc/self/fd"):
+        try:
+            target = os.readlink(f"/proc/self/fd/{fd}")
+        except OSError:
+            continue
+        if target.startswith(str(directory)):
+            paths.append(target)
+    return paths
+
+
+@pytest.mark.skipif(not os.path.isdir("/proc/self/fd"), reason="needs /proc")
+def test_query_reopens_replaced_file(swath_files, tmp_path):
+    filepath = str(tmp_path / "a.nc")
+    shutil.copy(swath_files[0], filepath)
+    index = SWOTSpatialIndex(str(tmp_path / "swot_index"), tile_size=20, autosave_interval=0)
+    index.add_file(filepath)
+    bounds = (31, 33, 289.5, 291.5)
+
+    before = query_swot_data(index, *bounds, variables=VARIABLES)
+
+    # Replace the file with new data, as a reprocessed product would be
+    with xr.open_dataset(filepath) as ds:
+        ds = ds.load()
+    ds["ssha_unfiltered"] += 1
+    ds.to_netcdf(tmp_path / "new.nc", engine="h5netcdf")
+    os.utime(tmp_path / "new.nc", ns=(0, os.stat(filepath).st_mtime_ns + 10**9))
+    os.replace(tmp_path / "new.nc", filepath)
+
+    after = query_swot_data(index, *bounds, variables=VARIABLES)
+    gc.collect()
+
+    xr.testing.assert_identical(after, _reference_query([filepath], *bounds, VARIABLES))
+    np.testing.assert_allclose(after["ssha_unfiltered"], before["ssha_unfiltered"] + 1)
+    # The handle of the replaced file was released
+    assert not any(path.endswith("(deleted)") for path in _open_paths(tmp_path))
+    assert _open_paths(tmp_path)
+
+    query_swot_data.cache_clear()
+    gc.collect()
+    assert not _open_paths(tmp_path)